@@ -648,6 +648,36 @@ class Volume(object):
         lv_object = get_lv(lv_name=self.lv_name, lv_path=self.lv_path)
         self.tags = lv_object.tags
 
+    def set_tags_batch(self, tags):
+        """
+        Same as ``set_tags`` but every tag that changes is removed (if it
+        exists) and added with a single ``lvchange`` call, instead of one (or
+        two) calls per tag::
+
+            lvchange --deltag ceph.osd_id=1 --addtag ceph.osd_id=0 --addtag ceph.type=data /dev/vg/lv
+
+        Tags that are already set to the same value are skipped. If no tag
+        changes at all, nothing is called and the tags are not refreshed,
+        otherwise they are refreshed at the end to reflect LVM's most current
+        view.
+        """
+        # lvm applies --addtag before --deltag within a single call, so a tag
+        # that is already set to the same value must be left alone, otherwise
+        # it would end up removed
+        tags = dict((k, v) for k, v in tags.items() if self.tags.get(k) != str(v))
+        if not tags:
+            return
+        command = ['sudo', 'lvchange']
+        for k, v in tags.items():
+            # remove it first if it exists
+            if self.tags.get(k):
+                command.extend(['--deltag', '%s=%s' % (k, self.tags[k])])
+            command.extend(['--addtag', '%s=%s' % (k, v)])
+        command.append(self.lv_path)
+        process.call(command)
+        lv_object = get_lv(lv_name=self.lv_name, lv_path=self.lv_path)
+        self.tags = lv_object.tags
+
     def set_tag(self, key, value):
         """
         Set the key/value pair as an LVM tag. Does not "refresh" the values of
@@ -58,6 +58,12 @@ def common_parser(prog, description):
         dest='block_wal',
         help='(bluestore) Path to bluestore block.wal logical volume or device',
     )
+    parser.add_argument(
+        '--no-monmap-cache',
+        dest='monmap_cache',
+        action='store_false', default=True,
+        help='Always fetch a new monmap, instead of re-using a recently fetched one',
+    )
     # Do not parse args, so that consumers can do something before the args get
     # parsed triggering argparse behavior
     return parser
@@ -1,6 +1,5 @@
 from __future__ import print_function
 from textwrap import dedent
-from ceph_volume.util import system
 from ceph_volume import decorators
 from .common import create_parser
 from .prepare import Prepare
@@ -16,8 +15,8 @@ class Create(object):
 
     @decorators.needs_root
     def create(self, args):
-        if not args.osd_fsid:
-            args.osd_fsid = system.generate_uuid()
+        # ``prepare`` sets ``args.osd_fsid`` when it generates one, so that
+        # activate can find the new OSD
         Prepare([]).prepare(args)
         Activate([]).activate(args)
 
@@ -1,75 +1,147 @@
 from __future__ import print_function
 import json
+import os
 import uuid
 from textwrap import dedent
 from ceph_volume.util import prepare as prepare_utils
-from ceph_volume.util import system, disk
+from ceph_volume.util import disk
 from ceph_volume import conf, decorators, terminal
 from ceph_volume.api import lvm as api
 from .common import prepare_parser
 
+# maps a resolved device path to its PARTUUID (or ``_NO_PTUUID`` when blkid
+# could not detect one) so that ``blkid`` is only called once per device
+_PTUUID_CACHE = {}
+_NO_PTUUID = object()
 
-def prepare_filestore(device, journal, secrets, id_=None, fsid=None):
+
+def clear_ptuuid_cache():
+    """
+    Drop all the PARTUUID lookups cached by ``Prepare.get_ptuuid``
+    """
+    _PTUUID_CACHE.clear()
+
+
+# the (conf.ceph, fsid) pair last read by ``_cluster_fsid``
+_CLUSTER_FSID = None
+
+
+def _cluster_fsid():
+    """
+    Read the cluster fsid from the configuration only once, as long as the
+    loaded configuration (``conf.ceph``) does not change
+    """
+    global _CLUSTER_FSID
+    if _CLUSTER_FSID is None or _CLUSTER_FSID[0] is not conf.ceph:
+        _CLUSTER_FSID = (conf.ceph, conf.ceph.get('global', 'fsid'))
+    return _CLUSTER_FSID[1]
+
+
+_SUB_COMMAND_HELP = dedent("""
+    Prepare an OSD by assigning an ID and FSID, registering them with the
+    cluster with an ID and FSID, formatting and mounting the volume, and
+    finally by adding all the metadata to the logical volumes using LVM
+    tags, so that it can later be discovered.
+
+    Once the OSD is ready, an ad-hoc systemd unit will be enabled so that
+    it can later get activated and the OSD daemon can get started.
+
+    Example calls for supported scenarios:
+
+    Filestore
+    ---------
+
+      Existing logical volume (lv) or device:
+
+          ceph-volume lvm prepare --filestore --data {vg/lv} --journal /path/to/device
+
+      Or:
+
+          ceph-volume lvm prepare --filestore --data {vg/lv} --journal {vg/lv}
+
+    Bluestore
+    ---------
+
+      Existing logical volume (lv):
+
+          ceph-volume lvm prepare --bluestore --data {vg/lv}
+
+      Existing block device, that will be made a group and logical volume:
+
+          ceph-volume lvm prepare --bluestore --data /path/to/device
+
+      Optionally, can consume db and wal devices or logical volumes:
+
+          ceph-volume lvm prepare --bluestore --data {vg/lv} --block.wal {device} --block-db {vg/lv}
+""")
+
+# built lazily by ``_get_parser``, and reused for every ``Prepare.main`` call
+_PARSER = None
+
+
+def _get_parser():
+    global _PARSER
+    if _PARSER is None:
+        _PARSER = prepare_parser(
+            prog='ceph-volume lvm prepare',
+            description=_SUB_COMMAND_HELP,
+        )
+    return _PARSER
+
+
+def prepare_filestore(device, journal, secrets, id_, fsid, cephx_secret=None, monmap_cache=False):
     """
     :param device: The name of the logical volume to work with
     :param journal: similar to device but can also be a regular/plain disk
     :param secrets: A dict with the secrets needed to create the osd (e.g. cephx)
-    :param id_: The OSD id
-    :param fsid: The OSD fsid, also known as the OSD UUID
+    :param id_: The OSD id, already created (with ``prepare_utils.create_id``)
+    :param fsid: The OSD fsid, also known as the OSD UUID, that ``id_`` was created with
+    :param cephx_secret: The cephx key, defaults to the one in ``secrets``
+    :param monmap_cache: Re-use a recently fetched monmap if available
     """
-    cephx_secret = secrets.get('cephx_secret', prepare_utils.create_key())
-    json_secrets = json.dumps(secrets)
+    if cephx_secret is None:
+        cephx_secret = secrets['cephx_secret']
 
-    # allow re-using an existing fsid, in case prepare failed
-    fsid = fsid or system.generate_uuid()
-    # allow re-using an id, in case a prepare failed
-    osd_id = id_ or prepare_utils.create_id(fsid, json_secrets)
     # create the directory
-    prepare_utils.create_osd_path(osd_id)
+    prepare_utils.create_osd_path(id_)
     # format the device
     prepare_utils.format_device(device)
     # mount the data device
-    prepare_utils.mount_osd(device, osd_id)
+    prepare_utils.mount_osd(device, id_)
     # symlink the journal
-    prepare_utils.link_journal(journal, osd_id)
+    prepare_utils.link_journal(journal, id_)
     # get the latest monmap
-    prepare_utils.get_monmap(osd_id)
+    prepare_utils.get_monmap(id_, cache=monmap_cache)
     # prepare the osd filesystem
-    prepare_utils.osd_mkfs_filestore(osd_id, fsid)
+    prepare_utils.osd_mkfs_filestore(id_, fsid)
     # write the OSD keyring if it doesn't exist already
-    prepare_utils.write_keyring(osd_id, cephx_secret)
+    prepare_utils.write_keyring(id_, cephx_secret)
 
 
-def prepare_bluestore(block, wal, db, secrets, id_=None, fsid=None):
+def prepare_bluestore(block, wal, db, secrets, id_, fsid, cephx_secret=None, monmap_cache=False):
     """
     :param block: The name of the logical volume for the bluestore data
     :param wal: a regular/plain disk or logical volume, to be used for block.wal
     :param db: a regular/plain disk or logical volume, to be used for block.db
     :param secrets: A dict with the secrets needed to create the osd (e.g. cephx)
-    :param id_: The OSD id
-    :param fsid: The OSD fsid, also known as the OSD UUID
+    :param id_: The OSD id, already created (with ``prepare_utils.create_id``)
+    :param fsid: The OSD fsid, also known as the OSD UUID, that ``id_`` was created with
+    :param cephx_secret: The cephx key, defaults to the one in ``secrets``
+    :param monmap_cache: Re-use a recently fetched monmap if available
     """
-    cephx_secret = secrets.get('cephx_secret', prepare_utils.create_key())
-    json_secrets = json.dumps(secrets)
+    if cephx_secret is None:
+        cephx_secret = secrets['cephx_secret']
 
-    # allow re-using an existing fsid, in case prepare failed
-    fsid = fsid or system.generate_uuid()
-    # allow re-using an id, in case a prepare failed
-    osd_id = id_ or prepare_utils.create_id(fsid, json_secrets)
     # create the directory
-    prepare_utils.create_osd_path(osd_id, tmpfs=True)
+    prepare_utils.create_osd_path(id_, tmpfs=True)
     # symlink the block, wal, and db
-    prepare_utils.link_block(block, osd_id)
-    if wal:
-        prepare_utils.link_wal(wal, osd_id)
-    if db:
-        prepare_utils.link_db(db, osd_id)
+    prepare_utils.link_devices(id_, block=block, wal=wal, db=db)
     # get the latest monmap
-    prepare_utils.get_monmap(osd_id)
+    prepare_utils.get_monmap(id_, cache=monmap_cache)
     # write the OSD keyring if it doesn't exist already
-    prepare_utils.write_keyring(osd_id, cephx_secret)
+    prepare_utils.write_keyring(id_, cephx_secret)
     # prepare the osd filesystem
-    prepare_utils.osd_mkfs_bluestore(osd_id, fsid, keyring=cephx_secret)
+    prepare_utils.osd_mkfs_bluestore(id_, fsid, keyring=cephx_secret)
 
 
 class Prepare(object):
@@ -78,10 +150,21 @@ class Prepare(object):
 
     def __init__(self, argv):
         self.argv = argv
+        # resolved logical volumes, keyed by (vg_name, lv_name)
+        self._lv_cache = {}
+        clear_ptuuid_cache()
 
     def get_ptuuid(self, argument):
-        uuid = disk.get_partuuid(argument)
-        if not uuid:
+        """
+        Query ``blkid`` for the PARTUUID of ``argument``, caching the result
+        (even when nothing was detected) keyed by the resolved device path
+        """
+        device = os.path.realpath(argument)
+        uuid = _PTUUID_CACHE.get(device)
+        if uuid is None:
+            uuid = disk.get_partuuid(argument) or _NO_PTUUID
+            _PTUUID_CACHE[device] = uuid
+        if uuid is _NO_PTUUID:
             terminal.error('blkid could not detect a PARTUUID for device: %s' % argument)
             raise RuntimeError('unable to use device')
         return uuid
@@ -91,6 +174,12 @@ class Prepare(object):
         Perform some parsing of the command-line value so that the process
         can determine correctly if it got a device path or an lv.
 
+        Lookups are cached for the lifetime of this object, so that the same
+        argument does not cause another ``lvs`` call. Cached ``Volume`` objects
+        stay current because ``Volume.set_tags_batch`` refreshes their tags in
+        place (it skips the refresh only when no tag changed, in which case
+        the cached tags are already current).
+
         :param argument: The command-line value that will need to be split to
                          retrieve the actual lv
         """
@@ -98,19 +187,24 @@ class Prepare(object):
             vg_name, lv_name = argument.split('/')
         except (ValueError, AttributeError):
             return None
-        return api.get_lv(lv_name=lv_name, vg_name=vg_name)
+        key = (vg_name, lv_name)
+        if key not in self._lv_cache:
+            self._lv_cache[key] = api.get_lv(lv_name=lv_name, vg_name=vg_name)
+        return self._lv_cache[key]
 
     def setup_device(self, device_type, device_name, tags):
         """
-        Check if ``device`` is an lv, if so, set the tags, making sure to
-        update the tags with the lv_uuid and lv_path which the incoming tags
-        will not have.
+        Check if ``device`` is an lv, if so, update a copy of the tags with the
+        lv_uuid and lv_path which the incoming tags will not have. The tags are
+        *not* applied here, so that callers can set them all at once with
+        ``set_device_tags``.
 
         If the device is not a logical volume, then retrieve the partition UUID
         by querying ``blkid``
         """
         if device_name is None:
             return '', '', tags
+        tags = dict(tags)
         tags['ceph.type'] = device_type
         lv = self.get_lv(device_name)
         if lv:
@@ -118,11 +212,80 @@ class Prepare(object):
             path = lv.lv_path
             tags['ceph.%s_uuid' % device_type] = uuid
             tags['ceph.%s_device' % device_type] = path
-            lv.set_tags(tags)
             return path, uuid, tags
         # otherwise assume this is a regular disk partition
         return device_name, self.get_ptuuid(device_name), tags
 
+    def setup_devices(self, devices, tags):
+        """
+        Call ``setup_device`` for every ``(device_type, device_name)`` pair in
+        ``devices``. These only involve (independent) ``lvs`` and ``blkid``
+        calls so when more than one device is given they are run concurrently,
+        each worker returning its own partial tags instead of mutating shared
+        state.
+
+        Once all the results are in, the tags are merged and applied once to
+        each device that is a logical volume (with its own ``ceph.type``).
+
+        :returns: A list of ``(device, uuid)`` pairs, in the same order as
+                  ``devices``, and the merged tags (with the incoming
+                  ``ceph.type``)
+        """
+        def setup(device):
+            device_type, device_name = device
+            return self.setup_device(device_type, device_name, tags)
+
+        # devices without a name have nothing to set up
+        named_devices = [d for d in devices if d[1] is not None]
+        if len(named_devices) > 1:
+            # only needed here, so avoid its (comparatively expensive) import
+            # for every other ceph-volume call
+            from multiprocessing.pool import ThreadPool
+            pool = ThreadPool(len(named_devices))
+            try:
+                named_results = pool.map(setup, named_devices)
+            finally:
+                pool.close()
+                pool.join()
+        else:
+            named_results = [setup(device) for device in named_devices]
+
+        named_results = iter(named_results)
+        results = [
+            next(named_results) if device_name is not None else ('', '', {})
+            for _, device_name in devices
+        ]
+
+        merged_tags = dict(tags)
+        for _, _, device_tags in results:
+            merged_tags.update(device_tags)
+        # every device gets its own type below, the merged tags keep the one
+        # they came in with (if any), so that it doesn't leak to other volumes
+        merged_tags.pop('ceph.type', None)
+        if 'ceph.type' in tags:
+            merged_tags['ceph.type'] = tags['ceph.type']
+
+        for device_type, device_name in devices:
+            if device_name is None:
+                continue
+            device_tags = dict(merged_tags)
+            device_tags['ceph.type'] = device_type
+            self.set_device_tags(device_name, device_tags)
+
+        return [(path, uuid) for path, uuid, _ in results], merged_tags
+
+    def set_device_tags(self, device_name, tags):
+        """
+        Apply ``tags`` (as computed by ``setup_device``) in a single
+        ``lvchange`` call if ``device_name`` is a logical volume, plain disks
+        and partitions are left alone.
+        """
+        if device_name is None:
+            return
+        lv = self.get_lv(device_name)
+        if lv:
+            lv.set_tags_batch(tags)
+
     @decorators.needs_root
     def prepare(self, args):
         # FIXME we don't allow re-using a keyring, we always generate one for the
@@ -130,11 +293,17 @@ class Prepare(object):
         # (!!) or some flags that we would need to compound into a dict so that we
         # can convert to JSON (!!!)
         secrets = {'cephx_secret': prepare_utils.create_key()}
-
-        cluster_fsid = conf.ceph.get('global', 'fsid')
-        osd_fsid = args.osd_fsid or system.generate_uuid()
+        cephx_secret = secrets['cephx_secret']
+        json_secrets = json.dumps(secrets)
+
+        cluster_fsid = _cluster_fsid()
+        # a re-used fsid (e.g. from a failed prepare) might already have a vg
+        reused_fsid = bool(args.osd_fsid)
+        osd_fsid = args.osd_fsid or str(uuid.uuid4())
+        # let callers (like ``lvm create``) know about a generated fsid
+        args.osd_fsid = osd_fsid
         # allow re-using an id, in case a prepare failed
-        osd_id = args.osd_id or prepare_utils.create_id(osd_fsid, json.dumps(secrets))
+        osd_id = args.osd_id or prepare_utils.create_id(osd_fsid, json_secrets)
         if args.filestore:
             if not args.journal:
                 raise RuntimeError('--journal is required when using --filestore')
@@ -142,35 +311,42 @@ class Prepare(object):
             data_lv = self.get_lv(args.data)
             if not data_lv:
                 raise RuntimeError('no data logical volume found with: %s' % args.data)
+            data_path = data_lv.lv_path
+            data_uuid = data_lv.lv_uuid
 
             tags = {
                 'ceph.osd_fsid': osd_fsid,
                 'ceph.osd_id': osd_id,
                 'ceph.cluster_fsid': cluster_fsid,
-                'ceph.data_device': data_lv.lv_path,
-                'ceph.data_uuid': data_lv.lv_uuid,
+                'ceph.data_device': data_path,
+                'ceph.data_uuid': data_uuid,
+                'ceph.type': 'data',
             }
 
-            journal_device, journal_uuid, tags = self.setup_device('journal', args.journal, tags)
+            devices, tags = self.setup_devices([('journal', args.journal)], tags)
+            journal_device, journal_uuid = devices[0]
 
-            data_lv.set_tags(tags)
+            data_lv.set_tags_batch(tags)
 
             prepare_filestore(
-                data_lv.lv_path,
+                data_path,
                 journal_device,
                 secrets,
                 id_=osd_id,
                 fsid=osd_fsid,
+                cephx_secret=cephx_secret,
+                monmap_cache=args.monmap_cache,
             )
         elif args.bluestore:
             block_lv = self.get_lv(args.data)
             if not block_lv:
-                if disk.is_partition(args.data) or disk.is_device(args.data):
-                    # we must create a vg, and then a single lv
-                    vg_name = "ceph-%s" % cluster_fsid
-                    if api.get_vg(vg_name=vg_name):
-                        # means we already have a group for this, make a different one
-                        # XXX this could end up being annoying for an operator, maybe?
+                if disk.classify(args.data) in (disk.PARTITION, disk.DEVICE):
+                    # we must create a vg, and then a single lv, named after
+                    # the osd fsid which is unique when it was just generated
+                    vg_name = "ceph-%s" % osd_fsid
+                    if reused_fsid and api.get_vg(vg_name=vg_name):
+                        # the re-used fsid already has a group, make a
+                        # different one
                         vg_name = "ceph-%s" % str(uuid.uuid4())
                     api.create_vg(vg_name, args.data)
                     block_name = "osd-block-%s" % osd_fsid
@@ -184,73 +360,40 @@ class Prepare(object):
                         'A vg/lv path or an existing device is needed'
                     ]
                     raise RuntimeError(' '.join(error))
+            block_path = block_lv.lv_path
+            block_uuid = block_lv.lv_uuid
 
             tags = {
                 'ceph.osd_fsid': osd_fsid,
                 'ceph.osd_id': osd_id,
                 'ceph.cluster_fsid': cluster_fsid,
-                'ceph.block_device': block_lv.lv_path,
-                'ceph.block_uuid': block_lv.lv_uuid,
+                'ceph.block_device': block_path,
+                'ceph.block_uuid': block_uuid,
+                'ceph.type': 'block',
             }
 
-            wal_device, wal_uuid, tags = self.setup_device('wal', args.block_wal, tags)
-            db_device, db_uuid, tags = self.setup_device('db', args.block_db, tags)
+            devices, tags = self.setup_devices(
+                [('wal', args.block_wal), ('db', args.block_db)],
+                tags
+            )
+            (wal_device, wal_uuid), (db_device, db_uuid) = devices
 
-            block_lv.set_tags(tags)
+            block_lv.set_tags_batch(tags)
 
             prepare_bluestore(
-                block_lv.lv_path,
+                block_path,
                 wal_device,
                 db_device,
                 secrets,
                 id_=osd_id,
                 fsid=osd_fsid,
+                cephx_secret=cephx_secret,
+                monmap_cache=args.monmap_cache,
             )
 
     def main(self):
-        sub_command_help = dedent("""
-        Prepare an OSD by assigning an ID and FSID, registering them with the
-        cluster with an ID and FSID, formatting and mounting the volume, and
-        finally by adding all the metadata to the logical volumes using LVM
-        tags, so that it can later be discovered.
-
-        Once the OSD is ready, an ad-hoc systemd unit will be enabled so that
-        it can later get activated and the OSD daemon can get started.
-
-        Example calls for supported scenarios:
-
-        Filestore
-        ---------
-
-          Existing logical volume (lv) or device:
-
-              ceph-volume lvm prepare --filestore --data {vg/lv} --journal /path/to/device
-
-          Or:
-
-              ceph-volume lvm prepare --filestore --data {vg/lv} --journal {vg/lv}
-
-        Bluestore
-        ---------
-
-          Existing logical volume (lv):
-
-              ceph-volume lvm prepare --bluestore --data {vg/lv}
-
-          Existing block device, that will be made a group and logical volume:
-
-              ceph-volume lvm prepare --bluestore --data /path/to/device
-
-          Optionally, can consume db and wal devices or logical volumes:
-
-              ceph-volume lvm prepare --bluestore --data {vg/lv} --block.wal {device} --block-db {vg/lv}
-        """)
-        parser = prepare_parser(
-            prog='ceph-volume lvm prepare',
-            description=sub_command_help,
-        )
         if len(self.argv) == 0:
-            print(sub_command_help)
+            print(_SUB_COMMAND_HELP)
             return
-        args = parser.parse_args(self.argv)
+        args = _get_parser().parse_args(self.argv)
         self.prepare(args)
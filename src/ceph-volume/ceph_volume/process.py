@@ -1,6 +1,12 @@
+try:
+    import queue
+except ImportError:
+    import Queue as queue
+import codecs
 from fcntl import fcntl, F_GETFL, F_SETFL
 from os import O_NONBLOCK, read
 import subprocess
+import sys
 from select import select
 from ceph_volume import terminal
 
@@ -8,6 +14,62 @@ import logging
 
 logger = logging.getLogger(__name__)
 
+# a bounded pool of buffers that ``call`` reuses to read subprocess output,
+# instead of allocating new ones for every command
+_BUF_SIZE = 65536
+_BUF_POOL = queue.LifoQueue(maxsize=8)
+
+# Python 3 decoders take a memoryview directly, Python 2 ones can only handle
+# strings, so only copy the chunk there
+if sys.version_info[0] < 3:
+    def _chunk(view):
+        return view.tobytes()
+else:
+    def _chunk(view):
+        return view
+
+
+def _get_buffer():
+    try:
+        return _BUF_POOL.get_nowait()
+    except queue.Empty:
+        return bytearray(_BUF_SIZE)
+
+
+def _put_buffer(buf):
+    try:
+        _BUF_POOL.put_nowait(buf)
+    except queue.Full:
+        # enough buffers pooled already, let this one go
+        pass
+
+
+def read_stream(stream):
+    """
+    Read everything from ``stream`` (until EOF) into a pooled buffer, decoding
+    it as utf-8 as it comes in. On Python 3 the decoder reads straight from
+    the buffer, so no intermediate ``bytes`` object is allocated for the
+    output (Python 2 still copies every chunk). The buffer goes back to the
+    pool once done.
+    """
+    buf = _get_buffer()
+    view = memoryview(buf)
+    # incremental, so that a multi-byte character split between two reads is
+    # still decoded correctly
+    decoder = codecs.getincrementaldecoder('utf-8')()
+    output = []
+    try:
+        while True:
+            size = stream.readinto(buf)
+            if not size:
+                break
+            output.append(decoder.decode(_chunk(view[:size])))
+        output.append(decoder.decode(b'', True))
+    finally:
+        del view
+        _put_buffer(buf)
+    return u''.join(output)
+
 
 def log_output(descriptor, message, terminal_logging):
     """
@@ -174,12 +236,12 @@ def call(command, **kw):
     if stdin:
         stdout_stream, stderr_stream = process.communicate(stdin)
     else:
-        stdout_stream = process.stdout.read()
-        stderr_stream = process.stderr.read()
+        stdout_stream = read_stream(process.stdout)
+        stderr_stream = read_stream(process.stderr)
     returncode = process.wait()
-    if not isinstance(stdout_stream, str):
+    if isinstance(stdout_stream, bytes):
         stdout_stream = stdout_stream.decode('utf-8')
-    if not isinstance(stderr_stream, str):
+    if isinstance(stderr_stream, bytes):
         stderr_stream = stderr_stream.decode('utf-8')
     stdout = stdout_stream.splitlines()
     stderr = stderr_stream.splitlines()
@@ -381,3 +381,54 @@ class TestCreateLV(object):
         api.create_lv('foo', 'foo_group', size='5G', tags={'ceph.type': 'data'})
         data_tag = ['sudo', 'lvchange', '--addtag', 'ceph.data_device=/path', '/path']
         assert capture.calls[2]['args'][0] == data_tag
+
+
+class TestSetTagsBatch(object):
+
+    def test_uses_a_single_lvchange_call(self, monkeypatch, capture):
+        volume = api.Volume(lv_name='foo', lv_path='/path', vg_name='foo_group', lv_tags='')
+        monkeypatch.setattr(process, 'call', capture)
+        monkeypatch.setattr(api, 'get_lv', lambda *a, **kw: volume)
+        volume.set_tags_batch({'ceph.type': 'data'})
+        assert len(capture.calls) == 1
+        expected = ['sudo', 'lvchange', '--addtag', 'ceph.type=data', '/path']
+        assert capture.calls[0]['args'][0] == expected
+
+    def test_removes_existing_tags(self, monkeypatch, capture):
+        volume = api.Volume(
+            lv_name='foo', lv_path='/path', vg_name='foo_group',
+            lv_tags='ceph.osd_id=1')
+        monkeypatch.setattr(process, 'call', capture)
+        monkeypatch.setattr(api, 'get_lv', lambda *a, **kw: volume)
+        volume.set_tags_batch({'ceph.osd_id': '0'})
+        expected = [
+            'sudo', 'lvchange',
+            '--deltag', 'ceph.osd_id=1',
+            '--addtag', 'ceph.osd_id=0',
+            '/path'
+        ]
+        assert capture.calls[0]['args'][0] == expected
+
+    def test_skips_tags_with_the_same_value(self, monkeypatch, capture):
+        volume = api.Volume(
+            lv_name='foo', lv_path='/path', vg_name='foo_group',
+            lv_tags='ceph.osd_id=0')
+        monkeypatch.setattr(process, 'call', capture)
+        monkeypatch.setattr(api, 'get_lv', lambda *a, **kw: volume)
+        volume.set_tags_batch({'ceph.osd_id': '0', 'ceph.type': 'data'})
+        expected = ['sudo', 'lvchange', '--addtag', 'ceph.type=data', '/path']
+        assert capture.calls[0]['args'][0] == expected
+
+    def test_only_same_values_does_nothing(self, monkeypatch, capture):
+        volume = api.Volume(
+            lv_name='foo', lv_path='/path', vg_name='foo_group',
+            lv_tags='ceph.osd_id=0')
+        monkeypatch.setattr(process, 'call', capture)
+        volume.set_tags_batch({'ceph.osd_id': '0'})
+        assert capture.calls == []
+
+    def test_no_tags_does_nothing(self, monkeypatch, capture):
+        volume = api.Volume(lv_name='foo', lv_path='/path', vg_name='foo_group', lv_tags='')
+        monkeypatch.setattr(process, 'call', capture)
+        volume.set_tags_batch({})
+        assert capture.calls == []
@@ -29,6 +29,14 @@ class TestPrepare(object):
         stdout, stderr = capsys.readouterr()
         assert 'Prepare an OSD by assigning an ID and FSID' in stdout
 
+    def test_main_with_no_arguments_does_not_build_parser(self, monkeypatch, capsys):
+        def fail():
+            raise AssertionError('should not build the parser')
+        monkeypatch.setattr(lvm.prepare, '_get_parser', fail)
+        lvm.prepare.Prepare([]).main()
+        stdout, stderr = capsys.readouterr()
+        assert 'Prepare an OSD by assigning an ID and FSID' in stdout
+
     def test_main_shows_full_help(self, capsys):
         with pytest.raises(SystemExit):
             lvm.prepare.Prepare(argv=['--help']).main()
@@ -37,6 +45,29 @@ class TestPrepare(object):
         assert 'Use the bluestore objectstore' in stdout
         assert 'Bluestore: A physical device or logical' in stdout
 
+    def test_parser_is_reused(self):
+        assert lvm.prepare._get_parser() is lvm.prepare._get_parser()
+
+
+class TestClusterFsid(object):
+
+    def test_reads_fsid_once(self, monkeypatch, factory):
+        calls = []
+
+        def get(section, key):
+            calls.append((section, key))
+            return '0000-1111'
+        monkeypatch.setattr(lvm.prepare.conf, 'ceph', factory(get=get), raising=False)
+        assert lvm.prepare._cluster_fsid() == '0000-1111'
+        assert lvm.prepare._cluster_fsid() == '0000-1111'
+        assert calls == [('global', 'fsid')]
+
+    def test_reads_again_for_new_configuration(self, monkeypatch, factory):
+        monkeypatch.setattr(lvm.prepare.conf, 'ceph', factory(get=lambda s, k: 'aaaa'), raising=False)
+        assert lvm.prepare._cluster_fsid() == 'aaaa'
+        monkeypatch.setattr(lvm.prepare.conf, 'ceph', factory(get=lambda s, k: 'bbbb'), raising=False)
+        assert lvm.prepare._cluster_fsid() == 'bbbb'
+
 
 class TestGetJournalLV(object):
 
@@ -52,6 +83,22 @@ class TestGetJournalLV(object):
         prepare = lvm.prepare.Prepare([])
         assert prepare.get_lv('vg/lv') == 0
 
+    def test_lv_lookup_is_cached(self, monkeypatch):
+        calls = []
+
+        def get_lv(**kw):
+            calls.append(kw)
+            return None
+        monkeypatch.setattr(lvm.prepare.api, 'get_lv', get_lv)
+        prepare = lvm.prepare.Prepare([])
+        prepare.get_lv('vg/lv')
+        prepare.get_lv('vg/lv')
+        prepare.get_lv('vg/other')
+        assert calls == [
+            {'lv_name': 'lv', 'vg_name': 'vg'},
+            {'lv_name': 'other', 'vg_name': 'vg'},
+        ]
+
 
 class TestActivate(object):
 
@@ -67,3 +114,177 @@ class TestActivate(object):
         assert 'optional arguments' in stdout
         assert 'positional arguments' in stdout
 
+
+class TestGetPtuuid(object):
+
+    def test_caches_partuuid(self, monkeypatch):
+        calls = []
+
+        def get_partuuid(device):
+            calls.append(device)
+            return '0000-1111'
+        monkeypatch.setattr(lvm.prepare.disk, 'get_partuuid', get_partuuid)
+        prepare = lvm.prepare.Prepare([])
+        assert prepare.get_ptuuid('/dev/sda1') == '0000-1111'
+        assert prepare.get_ptuuid('/dev/sda1') == '0000-1111'
+        assert len(calls) == 1
+
+    def test_caches_missing_partuuid(self, monkeypatch):
+        calls = []
+
+        def get_partuuid(device):
+            calls.append(device)
+            return ''
+        monkeypatch.setattr(lvm.prepare.disk, 'get_partuuid', get_partuuid)
+        prepare = lvm.prepare.Prepare([])
+        for i in range(2):
+            with pytest.raises(RuntimeError):
+                prepare.get_ptuuid('/dev/sda1')
+        assert len(calls) == 1
+
+    def test_new_prepare_clears_cache(self, monkeypatch):
+        monkeypatch.setattr(lvm.prepare.disk, 'get_partuuid', lambda d: '0000-1111')
+        lvm.prepare.Prepare([]).get_ptuuid('/dev/sda1')
+        lvm.prepare.Prepare([])
+        assert lvm.prepare._PTUUID_CACHE == {}
+
+
+class TestSetupDevice(object):
+
+    def test_does_not_set_tags(self, monkeypatch, factory, capture):
+        lv = factory(lv_uuid='0000', lv_path='/dev/vg/wal', set_tags=capture, set_tags_batch=capture)
+        monkeypatch.setattr(lvm.prepare.api, 'get_lv', lambda **kw: lv)
+        prepare = lvm.prepare.Prepare([])
+        tags = {'ceph.osd_id': '0'}
+        path, uuid, new_tags = prepare.setup_device('wal', 'vg/wal', tags)
+        assert capture.calls == []
+        assert (path, uuid) == ('/dev/vg/wal', '0000')
+        assert new_tags['ceph.wal_uuid'] == '0000'
+        assert new_tags['ceph.wal_device'] == '/dev/vg/wal'
+        # the incoming tags are left untouched
+        assert tags == {'ceph.osd_id': '0'}
+
+    def test_set_device_tags_uses_batch(self, monkeypatch, factory, capture):
+        lv = factory(set_tags_batch=capture)
+        monkeypatch.setattr(lvm.prepare.api, 'get_lv', lambda **kw: lv)
+        prepare = lvm.prepare.Prepare([])
+        prepare.set_device_tags('vg/wal', {'ceph.type': 'wal'})
+        assert capture.calls == [{'args': ({'ceph.type': 'wal'},), 'kwargs': {}}]
+
+    def test_set_device_tags_skips_partitions(self, monkeypatch):
+        monkeypatch.setattr(lvm.prepare.api, 'get_lv', lambda **kw: None)
+        prepare = lvm.prepare.Prepare([])
+        assert prepare.set_device_tags('/dev/sda1', {'ceph.type': 'wal'}) is None
+
+
+class TestSetupDevices(object):
+
+    def test_merges_tags_from_all_devices(self, monkeypatch, factory, capture):
+        lvs = {
+            'wal': factory(lv_uuid='1111', lv_path='/dev/vg/wal', set_tags_batch=capture),
+            'db': factory(lv_uuid='2222', lv_path='/dev/vg/db', set_tags_batch=capture),
+        }
+        monkeypatch.setattr(lvm.prepare.api, 'get_lv', lambda **kw: lvs[kw['lv_name']])
+        prepare = lvm.prepare.Prepare([])
+        devices, tags = prepare.setup_devices(
+            [('wal', 'vg/wal'), ('db', 'vg/db')],
+            {'ceph.osd_id': '0', 'ceph.type': 'block'}
+        )
+        assert devices == [('/dev/vg/wal', '1111'), ('/dev/vg/db', '2222')]
+        assert tags['ceph.osd_id'] == '0'
+        assert tags['ceph.wal_uuid'] == '1111'
+        assert tags['ceph.db_uuid'] == '2222'
+        # the type of the incoming tags is kept, not the last device's
+        assert tags['ceph.type'] == 'block'
+        types = sorted(call['args'][0]['ceph.type'] for call in capture.calls)
+        assert types == ['db', 'wal']
+
+    def test_device_type_does_not_leak(self, monkeypatch, factory, capture):
+        lv = factory(lv_uuid='1111', lv_path='/dev/vg/journal', set_tags_batch=capture)
+        monkeypatch.setattr(lvm.prepare.api, 'get_lv', lambda **kw: lv)
+        prepare = lvm.prepare.Prepare([])
+        devices, tags = prepare.setup_devices(
+            [('journal', 'vg/journal')],
+            {'ceph.osd_id': '0'}
+        )
+        assert 'ceph.type' not in tags
+        assert capture.calls[0]['args'][0]['ceph.type'] == 'journal'
+
+    def test_missing_devices_are_skipped(self, monkeypatch, factory, capture):
+        lv = factory(lv_uuid='1111', lv_path='/dev/vg/wal', set_tags_batch=capture)
+        monkeypatch.setattr(lvm.prepare.api, 'get_lv', lambda **kw: lv)
+        prepare = lvm.prepare.Prepare([])
+        devices, tags = prepare.setup_devices(
+            [('wal', 'vg/wal'), ('db', None)],
+            {'ceph.osd_id': '0'}
+        )
+        assert devices == [('/dev/vg/wal', '1111'), ('', '')]
+        assert len(capture.calls) == 1
+
+    def test_no_pool_for_a_single_named_device(self, monkeypatch, factory, capture):
+        import multiprocessing.pool
+
+        def fail(*a):
+            raise AssertionError('should not use a thread pool')
+        monkeypatch.setattr(multiprocessing.pool, 'ThreadPool', fail)
+        lv = factory(lv_uuid='1111', lv_path='/dev/vg/wal', set_tags_batch=capture)
+        monkeypatch.setattr(lvm.prepare.api, 'get_lv', lambda **kw: lv)
+        prepare = lvm.prepare.Prepare([])
+        devices, tags = prepare.setup_devices(
+            [('wal', 'vg/wal'), ('db', None)],
+            {'ceph.osd_id': '0'}
+        )
+        assert devices == [('/dev/vg/wal', '1111'), ('', '')]
+        devices, tags = prepare.setup_devices(
+            [('wal', None), ('db', None)],
+            {'ceph.osd_id': '0'}
+        )
+        assert devices == [('', ''), ('', '')]
+
+    def test_errors_are_raised(self, monkeypatch):
+        monkeypatch.setattr(lvm.prepare.api, 'get_lv', lambda **kw: None)
+        monkeypatch.setattr(lvm.prepare.disk, 'get_partuuid', lambda d: '')
+        prepare = lvm.prepare.Prepare([])
+        with pytest.raises(RuntimeError):
+            prepare.setup_devices([('wal', '/dev/sda1'), ('db', '/dev/sdb1')], {})
+
+
+class TestPrepareBluestoreDevice(object):
+
+    def setup_prepare(self, monkeypatch, factory, capture):
+        monkeypatch.setattr(lvm.prepare.prepare_utils, 'create_key', lambda: 'key')
+        monkeypatch.setattr(lvm.prepare.prepare_utils, 'create_id', lambda *a: '0')
+        monkeypatch.setattr(lvm.prepare, '_cluster_fsid', lambda: '1234')
+        monkeypatch.setattr(lvm.prepare.api, 'get_lv', lambda **kw: None)
+        monkeypatch.setattr(lvm.prepare.disk, 'classify', lambda dev: lvm.prepare.disk.DEVICE)
+        monkeypatch.setattr(lvm.prepare.api, 'create_vg', capture)
+        block_lv = factory(lv_path='/dev/vg/block', lv_uuid='2222', set_tags_batch=lambda tags: None)
+        monkeypatch.setattr(lvm.prepare.api, 'create_lv', lambda *a, **kw: block_lv)
+        monkeypatch.setattr(lvm.prepare, 'prepare_bluestore', lambda *a, **kw: None)
+
+    def args(self, factory, osd_fsid=None):
+        return factory(
+            osd_fsid=osd_fsid, osd_id=None, filestore=False, bluestore=True,
+            data='/dev/sdb', block_wal=None, block_db=None, monmap_cache=True,
+        )
+
+    def test_generated_fsid_skips_vg_probe(self, is_root, monkeypatch, factory, capture):
+        self.setup_prepare(monkeypatch, factory, capture)
+
+        def get_vg(**kw):
+            raise AssertionError('should not look for an existing vg')
+        monkeypatch.setattr(lvm.prepare.api, 'get_vg', get_vg)
+        args = self.args(factory)
+        lvm.prepare.Prepare([]).prepare(args)
+        # the generated fsid is made available to callers, like create
+        assert args.osd_fsid
+        assert capture.calls[0]['args'] == ('ceph-%s' % args.osd_fsid, '/dev/sdb')
+
+    def test_reused_fsid_probes_for_vg(self, is_root, monkeypatch, factory, capture):
+        self.setup_prepare(monkeypatch, factory, capture)
+        monkeypatch.setattr(lvm.prepare.api, 'get_vg', lambda **kw: object())
+        args = self.args(factory, osd_fsid='aaaa')
+        lvm.prepare.Prepare([]).prepare(args)
+        vg_name = capture.calls[0]['args'][0]
+        assert vg_name.startswith('ceph-')
+        assert vg_name != 'ceph-aaaa'
@@ -0,0 +1,43 @@
+import io
+from ceph_volume import process
+
+
+class TestReadStream(object):
+
+    def test_reads_everything(self):
+        stream = io.BytesIO(b'line one\nline two\n')
+        assert process.read_stream(stream) == u'line one\nline two\n'
+
+    def test_empty_stream(self):
+        assert process.read_stream(io.BytesIO(b'')) == u''
+
+    def test_output_larger_than_buffer(self, monkeypatch):
+        monkeypatch.setattr(process, '_get_buffer', lambda: bytearray(4))
+        monkeypatch.setattr(process, '_put_buffer', lambda buf: None)
+        stream = io.BytesIO(b'a' * 10)
+        assert process.read_stream(stream) == u'a' * 10
+
+    def test_multibyte_character_split_between_reads(self, monkeypatch):
+        monkeypatch.setattr(process, '_get_buffer', lambda: bytearray(1))
+        monkeypatch.setattr(process, '_put_buffer', lambda buf: None)
+        stream = io.BytesIO(u'\xfcber'.encode('utf-8'))
+        assert process.read_stream(stream) == u'\xfcber'
+
+    def test_buffer_is_reused(self, monkeypatch):
+        buf = bytearray(8)
+        pooled = []
+        monkeypatch.setattr(process, '_get_buffer', lambda: buf)
+        monkeypatch.setattr(process, '_put_buffer', pooled.append)
+        process.read_stream(io.BytesIO(b'foo'))
+        assert pooled == [buf]
+
+
+class TestCall(object):
+
+    def test_captures_stdout_and_stderr(self):
+        stdout, stderr, returncode = process.call(
+            ['sh', '-c', 'echo out; echo err >&2']
+        )
+        assert stdout == ['out']
+        assert stderr == ['err']
+        assert returncode == 0
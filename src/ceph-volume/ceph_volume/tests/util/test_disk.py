@@ -0,0 +1,45 @@
+import os
+import stat
+from ceph_volume.util import disk
+
+
+class TestClassify(object):
+
+    def test_missing_path_is_other(self, tmpdir):
+        assert disk.classify(str(tmpdir.join('missing'))) == disk.OTHER
+
+    def test_lsblk_disk_is_device(self, monkeypatch, tmpdir):
+        monkeypatch.setattr(disk, 'lsblk', lambda dev: {'TYPE': 'disk'})
+        assert disk.classify(str(tmpdir)) == disk.DEVICE
+
+    def test_lsblk_part_is_partition(self, monkeypatch, tmpdir):
+        monkeypatch.setattr(disk, 'lsblk', lambda dev: {'TYPE': 'part'})
+        assert disk.classify(str(tmpdir)) == disk.PARTITION
+
+    def test_lsblk_lvm_is_lv(self, monkeypatch, tmpdir):
+        monkeypatch.setattr(disk, 'lsblk', lambda dev: {'TYPE': 'lvm'})
+        assert disk.classify(str(tmpdir)) == disk.LV
+
+    def test_lsblk_unknown_type_is_other(self, monkeypatch, tmpdir):
+        monkeypatch.setattr(disk, 'lsblk', lambda dev: {'TYPE': 'rom'})
+        assert disk.classify(str(tmpdir)) == disk.OTHER
+
+    def test_fallback_not_a_block_device(self, monkeypatch, tmpdir):
+        monkeypatch.setattr(disk, 'lsblk', lambda dev: {})
+        assert disk.classify(str(tmpdir)) == disk.OTHER
+
+    def test_fallback_block_device(self, monkeypatch, factory):
+        monkeypatch.setattr(disk, 'lsblk', lambda dev: {})
+        stat_obj = factory(st_mode=stat.S_IFBLK, st_rdev=os.makedev(8, 0))
+        monkeypatch.setattr(disk.os, 'stat', lambda dev: stat_obj)
+        monkeypatch.setattr(disk.os.path, 'exists', lambda path: False)
+        assert disk.classify('/dev/sda') == disk.DEVICE
+
+    def test_fallback_block_partition(self, monkeypatch, factory):
+        monkeypatch.setattr(disk, 'lsblk', lambda dev: {})
+        stat_obj = factory(st_mode=stat.S_IFBLK, st_rdev=os.makedev(8, 1))
+        monkeypatch.setattr(disk.os, 'stat', lambda dev: stat_obj)
+        monkeypatch.setattr(
+            disk.os.path, 'exists',
+            lambda path: path == '/sys/dev/block/8:1/partition')
+        assert disk.classify('/dev/sda1') == disk.PARTITION
@@ -0,0 +1,117 @@
+import pytest
+from ceph_volume.util import prepare
+
+
+class TestLinkDevices(object):
+
+    def setup_links(self, monkeypatch, capture):
+        monkeypatch.setattr(prepare.conf, 'cluster', 'ceph', raising=False)
+        monkeypatch.setattr(prepare.system, 'chown', lambda *a, **kw: None)
+        monkeypatch.setattr(prepare.os, 'symlink', capture)
+
+    def test_links_all_devices(self, monkeypatch, capture):
+        self.setup_links(monkeypatch, capture)
+        # force the fallback, which does not need an existing OSD directory
+        monkeypatch.setattr(prepare.os, 'supports_dir_fd', set(), raising=False)
+        prepare.link_devices('0', block='/dev/vg/block', wal='/dev/sdb1', db='/dev/sdc1')
+        links = [call['args'] for call in capture.calls]
+        assert links == [
+            ('/dev/vg/block', '/var/lib/ceph/osd/ceph-0/block'),
+            ('/dev/sdb1', '/var/lib/ceph/osd/ceph-0/block.wal'),
+            ('/dev/sdc1', '/var/lib/ceph/osd/ceph-0/block.db'),
+        ]
+
+    def test_skips_missing_devices(self, monkeypatch, capture):
+        self.setup_links(monkeypatch, capture)
+        monkeypatch.setattr(prepare.os, 'supports_dir_fd', set(), raising=False)
+        prepare.link_devices('0', block='/dev/vg/block', wal='', db=None)
+        assert len(capture.calls) == 1
+
+    def test_uses_directory_descriptor(self, monkeypatch, capture):
+        self.setup_links(monkeypatch, capture)
+        opened = []
+        monkeypatch.setattr(prepare.os, 'supports_dir_fd', set([capture]), raising=False)
+        monkeypatch.setattr(prepare.os, 'open', lambda path, flags: opened.append(path) or 42)
+        monkeypatch.setattr(prepare.os, 'close', lambda fd: opened.append(fd))
+        prepare.link_devices('0', block='/dev/vg/block', db='/dev/sdc1')
+        assert opened == ['/var/lib/ceph/osd/ceph-0', 42]
+        assert capture.calls == [
+            {'args': ('/dev/vg/block', 'block'), 'kwargs': {'dir_fd': 42}},
+            {'args': ('/dev/sdc1', 'block.db'), 'kwargs': {'dir_fd': 42}},
+        ]
+
+
+class TestGetMonmap(object):
+
+    def setup_monmap(self, monkeypatch, capture):
+        monkeypatch.setattr(prepare.conf, 'cluster', 'ceph', raising=False)
+        monkeypatch.setattr(prepare.process, 'run', capture)
+        monkeypatch.setattr(prepare.system, 'mkdir_p', lambda *a, **kw: None)
+        monkeypatch.setattr(prepare.os, 'rename', lambda *a: None)
+        monkeypatch.setattr(prepare.shutil, 'copyfile', capture)
+
+    def test_fetches_into_osd_dir_without_cache(self, monkeypatch, capture):
+        self.setup_monmap(monkeypatch, capture)
+        prepare.get_monmap('0')
+        command = capture.calls[0]['args'][0]
+        assert command[-1] == '/var/lib/ceph/osd/ceph-0/activate.monmap'
+        assert len(capture.calls) == 1
+
+    def test_fetches_and_copies_when_not_cached(self, monkeypatch, capture):
+        self.setup_monmap(monkeypatch, capture)
+        monkeypatch.setattr(prepare, '_is_fresh', lambda path, ttl: False)
+        prepare.get_monmap('0', cache=True)
+        command = capture.calls[0]['args'][0]
+        assert command[-1].startswith('/var/lib/ceph/tmp/ceph.activate.monmap.')
+        assert capture.calls[1]['args'] == (
+            '/var/lib/ceph/tmp/ceph.activate.monmap',
+            '/var/lib/ceph/osd/ceph-0/activate.monmap',
+        )
+
+    def test_removes_temporary_monmap_on_failure(self, monkeypatch, capture):
+        self.setup_monmap(monkeypatch, capture)
+        removed = []
+
+        def fail(command):
+            raise RuntimeError('command returned non-zero exit status: 1')
+        monkeypatch.setattr(prepare.process, 'run', fail)
+        monkeypatch.setattr(prepare, '_is_fresh', lambda path, ttl: False)
+        monkeypatch.setattr(prepare.os.path, 'exists', lambda path: True)
+        monkeypatch.setattr(prepare.os, 'remove', removed.append)
+        with pytest.raises(RuntimeError):
+            prepare.get_monmap('0', cache=True)
+        assert len(removed) == 1
+        assert removed[0].startswith('/var/lib/ceph/tmp/ceph.activate.monmap.')
+        # nothing gets copied
+        assert capture.calls == []
+
+    def test_copies_fresh_cached_monmap(self, monkeypatch, capture):
+        self.setup_monmap(monkeypatch, capture)
+        monkeypatch.setattr(prepare, '_is_fresh', lambda path, ttl: True)
+        prepare.get_monmap('0', cache=True)
+        # no ceph call, just the copy
+        assert len(capture.calls) == 1
+        assert capture.calls[0]['args'][1] == '/var/lib/ceph/osd/ceph-0/activate.monmap'
+
+
+class TestIsFresh(object):
+
+    def test_missing_path_is_not_fresh(self, tmpdir):
+        assert prepare._is_fresh(str(tmpdir.join('monmap')), 60) is False
+
+    def test_new_file_is_fresh(self, tmpdir):
+        monmap = tmpdir.join('monmap')
+        monmap.write('')
+        assert prepare._is_fresh(str(monmap), 60) is True
+
+    def test_old_file_is_not_fresh(self, tmpdir):
+        monmap = tmpdir.join('monmap')
+        monmap.write('')
+        monmap.setmtime(monmap.mtime() - 120)
+        assert prepare._is_fresh(str(monmap), 60) is False
+
+    def test_future_file_is_not_fresh(self, tmpdir):
+        monmap = tmpdir.join('monmap')
+        monmap.write('')
+        monmap.setmtime(monmap.mtime() + 120)
+        assert prepare._is_fresh(str(monmap), 60) is False
@@ -15,3 +15,6 @@ mkfs = dict(
     ],
 )
 
+
+# how long (in seconds) a monmap fetched with caching enabled can be re-used
+monmap_cache_ttl = 60
@@ -2,6 +2,12 @@ import os
 import stat
 from ceph_volume import process
 
+# the kinds of devices that ``classify`` can report
+LV = 'lv'
+PARTITION = 'partition'
+DEVICE = 'device'
+OTHER = 'other'
+
 
 def get_partuuid(device):
     """
@@ -181,3 +187,33 @@ def is_partition(dev):
     if os.path.exists('/sys/dev/block/%d:%d/partition' % (major, minor)):
         return True
     return False
+
+
+def classify(dev):
+    """
+    Determine what kind of device ``dev`` is, returning one of ``LV``,
+    ``PARTITION``, ``DEVICE`` or ``OTHER`` (which includes non-existing paths).
+
+    Unlike calling ``is_partition`` and ``is_device`` one after the other, this
+    will ``stat`` the path and call ``lsblk`` just once, and if ``lsblk`` can't
+    tell, fall back to the ``stat`` result plus (at most) one ``/sys`` lookup.
+    """
+    try:
+        stat_obj = os.stat(dev)
+    except OSError:
+        return OTHER
+
+    # use lsblk first, fall back to using stat
+    TYPE = lsblk(dev).get('TYPE')
+    if TYPE:
+        return {'disk': DEVICE, 'part': PARTITION, 'lvm': LV}.get(TYPE, OTHER)
+
+    # fallback to stat
+    if not _stat_is_device(stat_obj.st_mode):
+        return OTHER
+
+    major = os.major(stat_obj.st_rdev)
+    minor = os.minor(stat_obj.st_rdev)
+    if os.path.exists('/sys/dev/block/%d:%d/partition' % (major, minor)):
+        return PARTITION
+    return DEVICE
@@ -6,6 +6,8 @@ the single-call helper
 """
 import os
 import logging
+import shutil
+import time
 from ceph_volume import process, conf
 from ceph_volume.util import system, constants
 
@@ -144,7 +146,63 @@ def link_db(db_device, osd_id):
     _link_device(db_device, 'block.db', osd_id)
 
 
-def get_monmap(osd_id):
+def link_devices(osd_id, block=None, wal=None, db=None):
+    """
+    Link all the given devices in the OSD directory in one go, instead of
+    calling the ``link_*`` helpers (and spawning ``ln`` and ``chown``) for each
+    one of them. The devices get ``chown``'d to the ceph user, and when
+    supported the OSD directory is opened just once so that every symlink is
+    created relative to it.
+    """
+    path = '/var/lib/ceph/osd/%s-%s' % (conf.cluster, osd_id)
+    links = [
+        (device, device_type) for device, device_type in
+        [(block, 'block'), (wal, 'block.wal'), (db, 'block.db')]
+        if device
+    ]
+    for device, device_type in links:
+        system.chown(device, recursive=False)
+
+    if os.symlink in getattr(os, 'supports_dir_fd', set()):
+        dir_fd = os.open(path, os.O_RDONLY | getattr(os, 'O_DIRECTORY', 0))
+        try:
+            for device, device_type in links:
+                logger.info('linking %s to %s/%s', device, path, device_type)
+                os.symlink(device, device_type, dir_fd=dir_fd)
+        finally:
+            os.close(dir_fd)
+    else:
+        for device, device_type in links:
+            logger.info('linking %s to %s/%s', device, path, device_type)
+            os.symlink(device, os.path.join(path, device_type))
+
+
+def _fetch_monmap(destination):
+    bootstrap_keyring = '/var/lib/ceph/bootstrap-osd/%s.keyring' % conf.cluster
+    process.run([
+        'sudo',
+        'ceph',
+        '--cluster', conf.cluster,
+        '--name', 'client.bootstrap-osd',
+        '--keyring', bootstrap_keyring,
+        'mon', 'getmap', '-o', destination
+    ])
+
+
+def _is_fresh(path, ttl):
+    """
+    Boolean to determine if ``path`` exists and was modified less than ``ttl``
+    seconds ago. A modification time in the future (e.g. the clock stepped
+    backwards) is never considered fresh
+    """
+    try:
+        mtime = os.stat(path).st_mtime
+    except OSError:
+        return False
+    return 0 <= time.time() - mtime < ttl
+
+
+def get_monmap(osd_id, cache=False):
     """
     Before creating the OSD files, a monmap needs to be retrieved so that it
     can be used to tell the monitor(s) about the new OSD. A call will look like::
@@ -152,19 +210,36 @@ def get_monmap(osd_id):
         ceph --cluster ceph --name client.bootstrap-osd \
              --keyring /var/lib/ceph/bootstrap-osd/ceph.keyring \
              mon getmap -o /var/lib/ceph/osd/ceph-0/activate.monmap
+
+    When ``cache`` is enabled the monmap is fetched into
+    ``/var/lib/ceph/tmp/`` and copied from there, so that when several OSDs get
+    prepared in a row the monitors are only asked once while the cached
+    monmap is less than ``constants.monmap_cache_ttl`` seconds old.
     """
     path = '/var/lib/ceph/osd/%s-%s/' % (conf.cluster, osd_id)
-    bootstrap_keyring = '/var/lib/ceph/bootstrap-osd/%s.keyring' % conf.cluster
     monmap_destination = os.path.join(path, 'activate.monmap')
 
-    process.run([
-        'sudo',
-        'ceph',
-        '--cluster', conf.cluster,
-        '--name', 'client.bootstrap-osd',
-        '--keyring', bootstrap_keyring,
-        'mon', 'getmap', '-o', monmap_destination
-    ])
+    if not cache:
+        _fetch_monmap(monmap_destination)
+        return
+
+    cached_monmap = '/var/lib/ceph/tmp/%s.activate.monmap' % conf.cluster
+    if not _is_fresh(cached_monmap, constants.monmap_cache_ttl):
+        system.mkdir_p('/var/lib/ceph/tmp')
+        # fetch into a temporary file first, and rename it, so that other
+        # ceph-volume processes never copy a partially written monmap
+        fetched_monmap = '%s.%s' % (cached_monmap, os.getpid())
+        try:
+            _fetch_monmap(fetched_monmap)
+            os.rename(fetched_monmap, cached_monmap)
+        except Exception:
+            # do not leave a partial (or empty) monmap behind
+            if os.path.exists(fetched_monmap):
+                os.remove(fetched_monmap)
+            raise
+    else:
+        logger.info('using cached monmap from %s', cached_monmap)
+    shutil.copyfile(cached_monmap, monmap_destination)
 
 
 def osd_mkfs_bluestore(osd_id, fsid, keyring=None, wal=False, db=False):